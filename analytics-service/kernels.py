@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def linreg(y):
+    """Least-squares fit y = a*x + b over x = 0..n-1 in one pass."""
+    n = len(y)
+    sx = sy = sxy = sx2 = 0.0
+    for i in range(n):
+        sx += i
+        sy += y[i]
+        sxy += i * y[i]
+        sx2 += i * i
+    a = (n * sxy - sx * sy) / (n * sx2 - sx * sx)
+    b = (sy - a * sx) / n
+    return a, b
+
+
+def warmup() -> None:
+    # compile (or load from cache) before the first real request
+    y = np.arange(16, dtype=np.float64)
+    linreg(y)
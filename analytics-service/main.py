@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, Dict, Any, List
+from fastapi.responses import ORJSONResponse
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import date, timedelta, datetime
+import asyncio
+import contextlib
 import os
-import requests
-import pandas as pd
+import httpx
 import numpy as np
+import orjson
+
+from kernels import linreg, warmup
 
 def _env_url(key: str, default: str) -> str:
     v = os.getenv(key, "").strip()
@@ -16,7 +21,18 @@ def _env_url(key: str, default: str) -> str:
 RATES_BASE_URL = _env_url("RATES_BASE_URL", "http://localhost:8000")
 PROFILE_BASE_URL = _env_url("PROFILE_BASE_URL", "")  # optional
 
-app = FastAPI(title="analytics-service", version="1.0.0")
+# Events are queued and shipped to profile-service in batches
+LOG_BATCH_SIZE = 64
+LOG_BATCH_WAIT = 0.1  # seconds
+LOG_FLUSH_TIMEOUT = 5.0  # seconds, final flush on shutdown
+_log_queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+_log_pending: List[Dict[str, Any]] = []  # batch taken off the queue but not yet posted
+_log_task: Optional[asyncio.Task] = None
+
+app = FastAPI(title="analytics-service", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Shared keep-alive client for calls to rates-service / profile-service
+_client = httpx.AsyncClient(timeout=20, limits=httpx.Limits(max_keepalive_connections=32))
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,38 +42,96 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def on_startup():
+    global _log_task
+    warmup()
+    if PROFILE_BASE_URL:
+        _log_task = asyncio.create_task(_drain_log())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if _log_task is not None:
+        _log_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _log_task
+        await _flush_log()
+    await _client.aclose()
+
 def _log_event(client_id: str, event: str, payload: Optional[str] = None) -> None:
     if not PROFILE_BASE_URL:
         return
     try:
-        requests.post(
-            f"{PROFILE_BASE_URL}/history",
-            json={"client_id": client_id, "event": event, "payload": payload},
-            timeout=5,
-        )
+        _log_queue.put_nowait({"client_id": client_id, "event": event, "payload": payload})
+    except asyncio.QueueFull:
+        pass  # best effort: drop rather than block the response
+
+async def _drain_log() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        _log_pending.append(await _log_queue.get())
+        deadline = loop.time() + LOG_BATCH_WAIT
+        while len(_log_pending) < LOG_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                _log_pending.append(await asyncio.wait_for(_log_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await _client.post(f"{PROFILE_BASE_URL}/history/bulk", json=_log_pending, timeout=5)
+        except Exception:
+            pass
+        # not reached on cancellation, so an interrupted batch is left for _flush_log
+        _log_pending.clear()
+
+async def _flush_log() -> None:
+    """Post whatever is still pending or queued in one last batch."""
+    while not _log_queue.empty():
+        _log_pending.append(_log_queue.get_nowait())
+    if not _log_pending:
+        return
+    try:
+        await _client.post(f"{PROFILE_BASE_URL}/history/bulk", json=_log_pending, timeout=LOG_FLUSH_TIMEOUT)
     except Exception:
         pass
+    _log_pending.clear()
 
-def _get_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
-    resp = requests.get(
+async def _get_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
+    resp = await _client.get(
         f"{RATES_BASE_URL}/cbr/history",
         params={"code": code, "date_from": date_from, "date_to": date_to},
-        timeout=20,
     )
-    return resp.json()
+    return orjson.loads(resp.content)
+
+async def _run_cpu(fn):
+    # numpy work runs off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, fn)
+
+def _points_to_arrays(pts: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+    """Split history points into (dates, rub_per_unit) in date order."""
+    dates = [p["date"] for p in pts]
+    vals = np.fromiter((p["rub_per_unit"] for p in pts), dtype=np.float64, count=len(pts))
+    # CBR returns records in chronological order; only sort when it didn't
+    if any(dates[i] > dates[i + 1] for i in range(len(dates) - 1)):
+        order = np.argsort(dates, kind="stable")
+        vals = vals[order]
+        dates = [dates[i] for i in order]
+    return dates, vals
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok", "rates_base_url": RATES_BASE_URL}
 
 @app.get("/analytics/volatility")
-def volatility(
+async def volatility(
     code: str = Query("USD"),
     date_from: str = Query(..., description="YYYY-MM-DD"),
     date_to: str = Query(..., description="YYYY-MM-DD"),
     client_id: str = Query("default"),
 ):
-    data = _get_history(code, date_from, date_to)
+    data = await _get_history(code, date_from, date_to)
     if data.get("error"):
         return data
 
@@ -65,28 +139,28 @@ def volatility(
     if len(pts) < 2:
         return {"error": "Недостаточно точек для расчёта"}
 
-    df = pd.DataFrame(pts)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date")
-    s = df["rub_per_unit"].astype(float)
-
-    out = {
-        "code": data.get("code"),
-        "name": data.get("name"),
-        "from": data.get("from"),
-        "to": data.get("to"),
-        "count": int(len(df)),
-        "mean": float(s.mean()),
-        "std": float(s.std(ddof=1)),
-        "min": float(s.min()),
-        "max": float(s.max()),
-        "pct_change_std": float(s.pct_change().dropna().std(ddof=1)),
-    }
+    def _compute() -> Dict[str, Any]:
+        _, y = _points_to_arrays(pts)
+
+        return {
+            "code": data.get("code"),
+            "name": data.get("name"),
+            "from": data.get("from"),
+            "to": data.get("to"),
+            "count": len(y),
+            "mean": y.mean().item(),
+            "std": y.std(ddof=1).item(),
+            "min": y.min().item(),
+            "max": y.max().item(),
+            "pct_change_std": (np.diff(y) / y[:-1]).std(ddof=1).item(),
+        }
+
+    out = await _run_cpu(_compute)
     _log_event(client_id, "volatility", f"{code} {date_from}..{date_to}")
     return out
 
 @app.get("/analytics/forecast")
-def forecast(
+async def forecast(
     code: str = Query("USD"),
     days: int = Query(7, ge=1, le=30),
     lookback: int = Query(45, ge=10, le=365),
@@ -95,7 +169,7 @@ def forecast(
     # Use last N days ending today
     end = date.today()
     start = end - timedelta(days=lookback)
-    data = _get_history(code, start.isoformat(), end.isoformat())
+    data = await _get_history(code, start.isoformat(), end.isoformat())
     if data.get("error"):
         return data
 
@@ -103,40 +177,37 @@ def forecast(
     if len(pts) < 10:
         return {"error": "Недостаточно исторических данных для прогноза"}
 
-    df = pd.DataFrame(pts)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date")
-
-    # simple linear regression on time index
-    y = df["rub_per_unit"].astype(float).to_numpy()
-    x = np.arange(len(y), dtype=float)
-
-    # fit y = a*x + b
-    a, b = np.polyfit(x, y, deg=1)
-
-    last_date = df["date"].iloc[-1].date()
-    future: List[Dict[str, Any]] = []
-    for i in range(1, days + 1):
-        xi = len(y) - 1 + i
-        yi = a * xi + b
-        d = last_date + timedelta(days=i)
-        future.append({"date": d.isoformat(), "rub_per_unit_pred": float(yi)})
-
-    out = {
-        "code": data.get("code"),
-        "name": data.get("name"),
-        "lookback_days": lookback,
-        "train_points": int(len(df)),
-        "model": {"type": "linear_regression", "a": float(a), "b": float(b)},
-        "forecast_days": days,
-        "forecast": future,
-        "last_observation": {"date": last_date.isoformat(), "rub_per_unit": float(y[-1])},
-    }
+    def _compute() -> Dict[str, Any]:
+        dates, y = _points_to_arrays(pts)
+
+        # simple linear regression on time index: y = a*x + b
+        a, b = linreg(y)
+
+        last_date = date.fromisoformat(dates[-1])
+        future: List[Dict[str, Any]] = []
+        for i in range(1, days + 1):
+            xi = len(y) - 1 + i
+            yi = a * xi + b
+            d = last_date + timedelta(days=i)
+            future.append({"date": d.isoformat(), "rub_per_unit_pred": float(yi)})
+
+        return {
+            "code": data.get("code"),
+            "name": data.get("name"),
+            "lookback_days": lookback,
+            "train_points": len(y),
+            "model": {"type": "linear_regression", "a": float(a), "b": float(b)},
+            "forecast_days": days,
+            "forecast": future,
+            "last_observation": {"date": dates[-1], "rub_per_unit": y[-1].item()},
+        }
+
+    out = await _run_cpu(_compute)
     _log_event(client_id, "forecast", f"{code} days={days} lookback={lookback}")
     return out
 
 @app.get("/analytics/sma")
-def sma(
+async def sma(
     code: str = Query("USD"),
     window: int = Query(7, ge=2, le=60),
     lookback: int = Query(120, ge=10, le=365),
@@ -144,28 +215,29 @@ def sma(
 ):
     end = date.today()
     start = end - timedelta(days=lookback)
-    data = _get_history(code, start.isoformat(), end.isoformat())
+    data = await _get_history(code, start.isoformat(), end.isoformat())
     if data.get("error"):
         return data
     pts = data.get("points") or []
     if len(pts) < window:
         return {"error": "Недостаточно данных для SMA"}
 
-    df = pd.DataFrame(pts)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date")
-    df["sma"] = df["rub_per_unit"].astype(float).rolling(window=window).mean()
-    last = df.dropna().iloc[-1]
-    out = {
-        "code": data.get("code"),
-        "name": data.get("name"),
-        "window": window,
-        "last": {"date": last["date"].date().isoformat(), "rub_per_unit": float(last["rub_per_unit"]), "sma": float(last["sma"])},
-    }
+    def _compute() -> Dict[str, Any]:
+        dates, y = _points_to_arrays(pts)
+        # only the last window is reported, so average just that slice
+        last_sma = y[-window:].mean().item()
+        return {
+            "code": data.get("code"),
+            "name": data.get("name"),
+            "window": window,
+            "last": {"date": dates[-1], "rub_per_unit": y[-1].item(), "sma": last_sma},
+        }
+
+    out = await _run_cpu(_compute)
     _log_event(client_id, "sma", f"{code} window={window}")
     return out
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8002"))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info")
+    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info", loop="uvloop")
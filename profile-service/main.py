@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Index, event, text
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import SQLModel, Field, Session, create_engine, select
 from typing import Optional, List
 from datetime import datetime
@@ -19,9 +22,34 @@ def _db_url() -> str:
         url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
     return url
 
-engine = create_engine(_db_url(), echo=False, pool_pre_ping=True)
+def _make_engine():
+    url = _db_url()
+    kwargs = {}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    eng = create_engine(
+        url,
+        echo=False,
+        pool_pre_ping=True,
+        pool_size=20,
+        max_overflow=40,
+        pool_recycle=1800,
+        **kwargs,
+    )
+    if url.startswith("sqlite"):
+        @event.listens_for(eng, "connect")
+        def _sqlite_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.close()
+    return eng
+
+engine = _make_engine()
 
 class Favorite(SQLModel, table=True):
+    __table_args__ = (Index("uq_fav_client_code", "client_id", "code", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     client_id: str = Field(index=True, default="default")
     code: str = Field(index=True)
@@ -36,12 +64,22 @@ class HistoryEvent(SQLModel, table=True):
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    # create_all doesn't touch existing tables: drop duplicate favorites
+    # (keeping the oldest row) and add the unique index if it's missing
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM favorite WHERE id NOT IN "
+            "(SELECT MIN(id) FROM favorite GROUP BY client_id, code)"
+        ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_fav_client_code ON favorite (client_id, code)"
+        ))
 
 def get_session():
     with Session(engine) as session:
         yield session
 
-app = FastAPI(title="profile-service", version="1.0.0")
+app = FastAPI(title="profile-service", version="1.0.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,7 +94,7 @@ def on_startup():
     init_db()
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 @app.get("/favorites", response_model=List[Favorite])
@@ -65,7 +103,8 @@ def list_favorites(
     session: Session = Depends(get_session),
 ):
     st = select(Favorite).where(Favorite.client_id == client_id).order_by(Favorite.created_at.desc())
-    return session.exec(st).all()
+    # already valid rows: skip the response_model round-trip
+    return ORJSONResponse([f.model_dump() for f in session.exec(st).all()])
 
 @app.post("/favorites", response_model=Favorite)
 def add_favorite(
@@ -75,12 +114,13 @@ def add_favorite(
     fav.code = fav.code.upper().strip()
     if not fav.code:
         raise HTTPException(status_code=400, detail="code is required")
-    # prevent duplicates
-    st = select(Favorite).where(Favorite.client_id == fav.client_id, Favorite.code == fav.code)
-    if session.exec(st).first():
-        raise HTTPException(status_code=409, detail="already in favorites")
+    # duplicates are rejected by uq_fav_client_code
     session.add(fav)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="already in favorites")
     session.refresh(fav)
     return fav
 
@@ -105,18 +145,27 @@ def list_history(
         .order_by(HistoryEvent.created_at.desc())
         .limit(limit)
     )
-    return session.exec(st).all()
+    return ORJSONResponse([ev.model_dump() for ev in session.exec(st).all()])
 
 @app.post("/history", response_model=HistoryEvent)
 def add_history(ev: HistoryEvent, session: Session = Depends(get_session)):
-    if not ev.event.strip():
+    if not (ev.event or "").strip():
         raise HTTPException(status_code=400, detail="event is required")
     session.add(ev)
     session.commit()
     session.refresh(ev)
     return ev
 
+@app.post("/history/bulk")
+def add_history_bulk(events: List[HistoryEvent], session: Session = Depends(get_session)):
+    if any(not (ev.event or "").strip() for ev in events):
+        raise HTTPException(status_code=400, detail="event is required")
+    # one transaction for the whole batch
+    session.bulk_insert_mappings(HistoryEvent, [ev.model_dump(exclude={"id"}) for ev in events])
+    session.commit()
+    return {"inserted": len(events)}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8001"))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info")
+    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info", loop="uvloop")
@@ -2,22 +2,55 @@ from __future__ import annotations
 
 from fastapi import FastAPI, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, List, Optional, Tuple
-import requests
-import time
-import csv
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Awaitable, Callable, Dict, Any, Iterator, List, Optional, Tuple
+import asyncio
+import html
+import httpx
+import orjson
+import os
+import re
 import io
-import xml.etree.ElementTree as ET
+from collections import defaultdict
 from datetime import datetime
 
+import numpy as np
+import redis.asyncio as aioredis
+from cachetools import LRUCache, TLRUCache
+from lxml import etree
+
 CBR_DAILY_XML = "https://www.cbr.ru/scripts/XML_daily.asp"
 CBR_DYNAMIC_XML = "https://www.cbr.ru/scripts/XML_dynamic.asp"
 
-# Cache: (kind, optional_date) -> (timestamp, payload)
-_cache: Dict[Tuple[str, Optional[str]], Tuple[float, Dict[str, Any]]] = {}
 TTL_SECONDS = 60 * 15  # 15 minutes
+CACHE_MAXSIZE = 256
+
+# Cache: (kind, optional_date) -> (payload, payload as JSON, payload as CSV rows, sorted currency list, ttl)
+# Each entry carries its own ttl so copies taken from Redis expire with the Redis key.
+_cache: TLRUCache = TLRUCache(maxsize=CACHE_MAXSIZE, ttu=lambda _key, entry, now: now + entry[4])
+# Per-key locks so only one coroutine fills a missing cache entry
+_locks: Dict[Tuple[str, Optional[str]], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# Optional L2 cache shared by all workers (L1 above stays per-process)
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+_redis: Optional[aioredis.Redis] = aioredis.from_url(REDIS_URL) if REDIS_URL else None
+
+# Last-Modified of the last upstream 200 plus the entry it produced, kept past
+# the TTL so an expired key can be revalidated with If-Modified-Since
+_last_modified: LRUCache = LRUCache(maxsize=CACHE_MAXSIZE)
+
+# In-flight upstream fetches: (kind, key) -> shared future (single-flight)
+_inflight: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
 
-app = FastAPI(title="rates-service (CBR)", version="1.0.0")
+# /cbr/history requests arriving within this window are fetched as one batch
+HISTORY_BATCH_WINDOW = 0.01  # seconds
+_history_batch: Dict[Tuple[str, str, str], asyncio.Future] = {}
+_history_flush: Optional[asyncio.Task] = None
+
+app = FastAPI(title="rates-service (CBR)", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Shared keep-alive client for cbr.ru
+_client = httpx.AsyncClient(timeout=20, limits=httpx.Limits(max_keepalive_connections=32))
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +61,13 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await _client.aclose()
+    if _redis is not None:
+        await _redis.aclose()
+
+
 def _date_to_cbr(date_iso: Optional[str]) -> Optional[str]:
     if not date_iso:
         return None
@@ -45,80 +85,252 @@ def _ddmmyyyy_to_iso(ddmmyyyy: Optional[str]) -> Optional[str]:
         return None
 
 
-def fetch_daily(date_iso: Optional[str] = None) -> Dict[str, Any]:
+async def _single_flight(
+    key: Tuple[str, Optional[str]], fetch: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Run fetch() once per key; concurrent callers await the same result."""
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(fetch())
+        _inflight[key] = fut
+        fut.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: a disconnecting client must not cancel the fetch for the others
+    return await asyncio.shield(fut)
+
+
+async def fetch_daily(date_iso: Optional[str] = None) -> Dict[str, Any]:
     """Fetch daily CBR rates; includes RUB as 1.0."""
     key = ("daily", date_iso)
-    now = time.time()
-    if key in _cache:
-        ts, data = _cache[key]
-        if now - ts < TTL_SECONDS:
+    entry = _cache.get(key)
+    if entry is not None:
+        return entry[0]
+    async with _locks[key]:
+        entry = _cache.get(key)
+        if entry is not None:
+            return entry[0]
+        hit = await _redis_get(key)
+        if hit is not None:
+            raw, ttl = hit
+            data = orjson.loads(raw)
+            _cache[key] = _make_entry(data, raw, ttl)  # skipped by the cache if ttl <= 0
             return data
+        data = await _single_flight(key, lambda: _fetch_daily_upstream(key, date_iso))
+    if len(_locks) > CACHE_MAXSIZE:
+        _prune_locks()
+    return data
+
+
+def _redis_key(key: Tuple[str, Optional[str]]) -> str:
+    kind, date_iso = key
+    return f"cbr:{kind}:{date_iso or 'latest'}"
+
+
+async def _redis_get(key: Tuple[str, Optional[str]]) -> Optional[Tuple[bytes, float]]:
+    """(payload, seconds left on the Redis key) or None on a miss."""
+    if _redis is None:
+        return None
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.get(_redis_key(key))
+            pipe.pttl(_redis_key(key))
+            raw, pttl = await pipe.execute()
+    except Exception:
+        return None  # L2 is best effort; fall through to upstream
+    if raw is None:
+        return None
+    # pttl is -1 for a key without expiry, -2 if it vanished after the GET
+    ttl = TTL_SECONDS if pttl == -1 else max(pttl, 0) / 1000
+    return raw, ttl
+
+
+async def _redis_set(key: Tuple[str, Optional[str]], payload: bytes) -> None:
+    if _redis is None:
+        return
+    try:
+        await _redis.set(_redis_key(key), payload, ex=TTL_SECONDS)
+    except Exception:
+        pass
+
+
+def _prune_locks() -> None:
+    for k in [k for k, lock in _locks.items() if k not in _cache and not lock.locked()]:
+        del _locks[k]
+
+
+# Parsed XML_daily as parallel columns:
+# (date, ids, num_codes, char_codes, names, nominals, values)
+_DailyColumns = Tuple[
+    Optional[str], List[Optional[str]], List[Optional[str]], List[str], List[str], List[int], List[Optional[float]]
+]
+
+_XML_ENC_RE = re.compile(rb'<\?xml[^>]*encoding="([^"]+)"')
+_DATE_RE = re.compile(r'<ValCurs[^>]*\sDate="([^"]*)"')
+_VAL_RE = re.compile(
+    r'<Valute ID="([^"]*)">.*?<NumCode>([^<]*)</NumCode>.*?<CharCode>([^<]*)</CharCode>'
+    r'.*?<Nominal>(\d+)</Nominal>.*?<Name>([^<]*)</Name>.*?<Value>([^<]*)</Value>',
+    re.DOTALL,
+)
+
+
+def _parse_daily_regex(content: bytes) -> Optional[_DailyColumns]:
+    """Fast path for the fixed XML_daily layout; None if the layout doesn't match."""
+    m = _XML_ENC_RE.match(content)
+    try:
+        text = content.decode(m.group(1).decode("ascii") if m else "utf-8")
+    except (LookupError, UnicodeDecodeError):
+        return None
+
+    ids: List[Optional[str]] = []
+    num_codes: List[Optional[str]] = []
+    chars: List[str] = []
+    names: List[str] = []
+    nominals: List[int] = []
+    values: List[Optional[float]] = []
+    for vm in _VAL_RE.finditer(text):
+        vid, num, char, nom, name, val = vm.groups()
+        ids.append(vid)
+        num_codes.append(num)
+        chars.append(char.upper())
+        names.append(html.unescape(name) if "&" in name else name)
+        nominals.append(int(nom))
+        try:
+            values.append(float(val.replace(",", ".")))
+        except ValueError:
+            values.append(None)
 
+    # every <Valute> must have matched, otherwise leave it to the XML parser
+    if not ids or len(ids) != text.count("<Valute "):
+        return None
+    dm = _DATE_RE.search(text)
+    return (dm.group(1) if dm else None), ids, num_codes, chars, names, nominals, values
+
+
+def _parse_daily_lxml(content: bytes) -> _DailyColumns:
+    # Stream <Valute> nodes straight into parallel columns
+    ids: List[Optional[str]] = []
+    num_codes: List[Optional[str]] = []
+    chars: List[str] = []
+    names: List[str] = []
+    nominals: List[int] = []
+    values: List[Optional[float]] = []
+
+    context = etree.iterparse(io.BytesIO(content), tag="Valute")
+    for _, valute in context:
+        ids.append(valute.get("ID"))
+        num_codes.append(valute.findtext("NumCode"))
+        chars.append((valute.findtext("CharCode") or "").upper())
+        names.append(valute.findtext("Name") or "")
+        nominals.append(int(valute.findtext("Nominal") or "1"))
+        value_text = (valute.findtext("Value") or "0").replace(",", ".")
+        try:
+            values.append(float(value_text))
+        except Exception:
+            values.append(None)
+        valute.clear()
+    date_attr = context.root.get("Date")  # DD.MM.YYYY (фактическая дата ЦБ)
+    return date_attr, ids, num_codes, chars, names, nominals, values
+
+
+async def _fetch_daily_upstream(key: Tuple[str, Optional[str]], date_iso: Optional[str]) -> Dict[str, Any]:
     params = {}
     cbr_date = _date_to_cbr(date_iso)
     if cbr_date:
         params["date_req"] = cbr_date
 
+    validator = _last_modified.get(key)
+    headers = {"If-Modified-Since": validator[0]} if validator else None
     try:
-        r = requests.get(CBR_DAILY_XML, params=params, timeout=20)
+        r = await _client.get(CBR_DAILY_XML, params=params, headers=headers)
     except Exception as e:
         return {"error": f"Network error: {e}"}
 
+    if r.status_code == 304 and validator:
+        entry = validator[1]
+        _cache[key] = entry  # unchanged upstream: restart the TTL
+        await _redis_set(key, entry[1])
+        return entry[0]
     if r.status_code != 200:
         return {"error": f"CBR returned {r.status_code}", "details": r.text[:300]}
 
-    root = ET.fromstring(r.text)
-    date_attr = root.attrib.get("Date")  # DD.MM.YYYY (фактическая дата ЦБ)
-
-    items: List[Dict[str, Any]] = []
-    rates: Dict[str, Dict[str, Any]] = {}
-
-    for valute in root.findall("Valute"):
-        charcode = (valute.findtext("CharCode") or "").upper()
-        name = valute.findtext("Name") or ""
-        nominal = int(valute.findtext("Nominal") or "1")
-        value_text = (valute.findtext("Value") or "0").replace(",", ".")
-        try:
-            value = float(value_text)
-        except Exception:
-            value = None
-        numcode = valute.findtext("NumCode")
-        vid = valute.attrib.get("ID")
-
-        item = {
-            "id": vid,
-            "num_code": numcode,
-            "char_code": charcode,
-            "name": name,
-            "nominal": nominal,
-            "value": value,
-        }
-        items.append(item)
-
-        if charcode and value is not None and nominal > 0:
-            rates[charcode] = {
-                "rub_per_unit": value / nominal,
-                "nominal": nominal,
-                "name": name,
-                "id": vid,
-            }
-
+    parsed = _parse_daily_regex(r.content) or _parse_daily_lxml(r.content)
+    date_attr, ids, num_codes, chars, names, nominals, values = parsed
+
+    values_arr = np.array(values, dtype=np.float64)  # None -> nan
+    nominals_arr = np.array(nominals, dtype=np.int32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_unit = (values_arr / nominals_arr).tolist()
+
+    items: List[Dict[str, Any]] = [
+        {"id": vid, "num_code": num, "char_code": c, "name": n, "nominal": nom, "value": v}
+        for vid, num, c, n, nom, v in zip(ids, num_codes, chars, names, nominals, values)
+    ]
+    rates_map = {
+        c: {"rub_per_unit": p, "name": n, "id": vid}
+        for vid, c, n, nom, v, p in zip(ids, chars, names, nominals, values, per_unit)
+        if c and v is not None and nom > 0
+    }
     # Add RUB 1:1
-    rates["RUB"] = {"rub_per_unit": 1.0, "nominal": 1, "name": "Российский рубль", "id": "RUB"}
+    rates_map["RUB"] = {"rub_per_unit": 1.0, "name": "Российский рубль", "id": "RUB"}
 
     data = {
         "date": date_attr,  # DD.MM.YYYY
         "count": len(items),
         "items": items,
         "requested_date_iso": date_iso,
-        "rates_map": {k: {"rub_per_unit": v["rub_per_unit"], "name": v["name"], "id": v["id"]} for k, v in rates.items()},
+        "rates_map": rates_map,
     }
-    _cache[key] = (now, data)
+    entry = _make_entry(data)
+    _cache[key] = entry
+    last_modified = r.headers.get("Last-Modified")
+    if last_modified:
+        _last_modified[key] = (last_modified, entry)
+    await _redis_set(key, entry[1])
     return data
 
 
-def get_valute_id(char_code: str, date_iso: Optional[str] = None) -> Optional[str]:
-    data = fetch_daily(date_iso)
+CSV_HEADER = "char_code,name,nominal,rub_per_nominal,rub_per_1\n"
+
+
+def _csv_esc(field: str) -> str:
+    if any(ch in field for ch in ',"\r\n'):
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
+
+def _csv_rows(data: Dict[str, Any]) -> List[str]:
+    """Formatted CSV data rows (without header) for a daily payload."""
+    items = data.get("items", [])
+    values = np.array([it["value"] or 0.0 for it in items], dtype=np.float64)
+    nominals = np.array([it["nominal"] or 1 for it in items], dtype=np.float64)
+    per1_str = np.char.mod("%.6f", values / nominals).tolist() if items else []
+    return [
+        f'{_csv_esc(it["char_code"])},{_csv_esc(it["name"])},{it["nominal"]},'
+        f'{"" if it["value"] is None else it["value"]},{p if it["value"] and it["nominal"] else ""}\n'
+        for it, p in zip(items, per1_str)
+    ]
+
+
+def _make_entry(
+    data: Dict[str, Any], json_bytes: Optional[bytes] = None, ttl: float = TTL_SECONDS
+) -> Tuple[Any, ...]:
+    """Everything the daily endpoints serve, derived once per fetched payload."""
+    rm = data.get("rates_map") or {}
+    currencies = sorted(({"code": k, "name": v.get("name", k)} for k, v in rm.items()), key=lambda x: x["code"])
+    if json_bytes is None:
+        json_bytes = orjson.dumps(data)
+    return data, json_bytes, _csv_rows(data), currencies, ttl
+
+
+def _cached_entry(date_iso: Optional[str], data: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Cache entry for a payload returned by fetch_daily (rebuilt if it was evicted meanwhile)."""
+    entry = _cache.get(("daily", date_iso))
+    if entry is not None and entry[0] is data:
+        return entry
+    return _make_entry(data)
+
+
+async def get_valute_id(char_code: str, date_iso: Optional[str] = None) -> Optional[str]:
+    data = await fetch_daily(date_iso)
     if "error" in data:
         return None
     rm = data.get("rates_map") or {}
@@ -126,7 +338,7 @@ def get_valute_id(char_code: str, date_iso: Optional[str] = None) -> Optional[st
     return info.get("id") if info else None
 
 
-def fetch_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
+async def fetch_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
     code = code.upper()
     if code == "RUB":
         # Flat RUB=1
@@ -138,13 +350,19 @@ def fetch_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
         if dt_to < dt_from:
             dt_from, dt_to = dt_to, dt_from
         delta = (dt_to - dt_from).days
-        points = []
-        for i in range(delta + 1):
-            d = datetime.fromordinal(dt_from.toordinal() + i).date()
-            points.append({"date": d.isoformat(), "rub_per_unit": 1.0})
+        dates = (np.datetime64(dt_from, "D") + np.arange(delta + 1, dtype="timedelta64[D]")).astype(str)
+        points = [{"date": d, "rub_per_unit": 1.0} for d in dates.tolist()]
         return {"code": "RUB", "name": "Российский рубль", "from": date_from, "to": date_to, "points": points}
 
-    val_id = get_valute_id(code, None)
+    key = ("history", f"{code} {date_from}..{date_to}")
+    return await _single_flight(key, lambda: _fetch_history_upstream(code, date_from, date_to))
+
+
+async def _fetch_history_upstream(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
+    # one daily lookup serves both the ID for XML_dynamic and the display name
+    daily = await fetch_daily(None)
+    info = None if "error" in daily else (daily.get("rates_map") or {}).get(code)
+    val_id = info.get("id") if info else None
     if not val_id:
         return {"error": f"Не найден код {code}"}
 
@@ -154,48 +372,81 @@ def fetch_history(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
         "VAL_NM_RQ": val_id,
     }
     try:
-        r = requests.get(CBR_DYNAMIC_XML, params=params, timeout=20)
+        r = await _client.get(CBR_DYNAMIC_XML, params=params)
     except Exception as e:
         return {"error": f"Network error: {e}"}
     if r.status_code != 200:
         return {"error": f"CBR returned {r.status_code}"}
 
-    root = ET.fromstring(r.text)
-    points: List[Dict[str, Any]] = []
-    for rec in root.findall("Record"):
-        date_attr = rec.attrib.get("Date")  # DD.MM.YYYY
+    dates: List[str] = []
+    values: List[float] = []
+    nominals: List[int] = []
+    for _, rec in etree.iterparse(io.BytesIO(r.content), tag="Record"):
+        date_attr = rec.get("Date")  # DD.MM.YYYY
         val_text = (rec.findtext("Value") or "0").replace(",", ".")
         nom_text = rec.findtext("Nominal") or "1"
+        rec.clear()
+        # fixed-width DD.MM.YYYY: slice instead of strptime
+        if not (date_attr and len(date_attr) == 10 and date_attr[2] == "." and date_attr[5] == "."):
+            continue
+        nominal = int(nom_text) if nom_text.isdigit() else 0
+        if not nominal:
+            continue
         try:
             value = float(val_text)
-            nominal = int(nom_text)
-            per_unit = value / nominal if nominal else None
-        except Exception:
-            per_unit = None
-        try:
-            dt = datetime.strptime(date_attr, "%d.%m.%Y").date()
-            date_iso = dt.isoformat()
-        except Exception:
-            date_iso = None
-        if date_iso and per_unit is not None:
-            points.append({"date": date_iso, "rub_per_unit": per_unit})
+        except ValueError:
+            continue
+        dates.append(f"{date_attr[6:10]}-{date_attr[3:5]}-{date_attr[0:2]}")
+        values.append(value)
+        nominals.append(nominal)
+
+    per_unit = np.array(values, dtype=np.float64) / np.array(nominals, dtype=np.int32)
+    points = [{"date": d, "rub_per_unit": p} for d, p in zip(dates, per_unit.tolist())]
 
-    data = fetch_daily(None)
-    name = (data.get("rates_map") or {}).get(code, {}).get("name", code)
+    name = info.get("name", code)
     return {"code": code, "name": name, "from": date_from, "to": date_to, "points": points}
 
 
+async def _flush_history_batch() -> None:
+    global _history_flush
+    await asyncio.sleep(HISTORY_BATCH_WINDOW)
+    batch = dict(_history_batch)
+    _history_batch.clear()
+    _history_flush = None
+    results = await asyncio.gather(*(fetch_history(*k) for k in batch), return_exceptions=True)
+    for fut, res in zip(batch.values(), results):
+        if fut.done():
+            continue
+        if isinstance(res, BaseException):
+            fut.set_exception(res)
+        else:
+            fut.set_result(res)
+
+
+async def fetch_history_batched(code: str, date_from: str, date_to: str) -> Dict[str, Any]:
+    """Queue a history request; everything queued within the window is fetched in parallel."""
+    global _history_flush
+    key = (code.upper(), date_from, date_to)
+    fut = _history_batch.get(key)
+    if fut is None:
+        fut = asyncio.get_running_loop().create_future()
+        _history_batch[key] = fut
+        if _history_flush is None:
+            _history_flush = asyncio.create_task(_flush_history_batch())
+    return await asyncio.shield(fut)
+
+
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
 @app.get("/cbr/daily")
-def cbr_daily(
+async def cbr_daily(
     date: Optional[str] = Query(None, description="YYYY-MM-DD — запрошенная дата"),
     strict: bool = Query(False, description="Если true — ошибка при несовпадении дат"),
 ):
-    data = fetch_daily(date)
+    data = await fetch_daily(date)
     if "error" in data:
         return data
 
@@ -203,17 +454,18 @@ def cbr_daily(
         cbr_iso = _ddmmyyyy_to_iso(data.get("date"))
         if cbr_iso and cbr_iso != date:
             return {"error": f"Для {date} файл ЦБ недоступен (последняя дата ЦБ: {data.get('date')})."}
-    return data
+    json_bytes = _cached_entry(date, data)[1]
+    return Response(content=json_bytes, media_type="application/json")
 
 
 @app.get("/cbr/history")
-def cbr_history(code: str = Query(...), date_from: str = Query(...), date_to: str = Query(...)):
-    return fetch_history(code, date_from, date_to)
+async def cbr_history(code: str = Query(...), date_from: str = Query(...), date_to: str = Query(...)):
+    return await fetch_history_batched(code, date_from, date_to)
 
 
 @app.get("/cbr/convert")
-def cbr_convert(from_code: str, to_code: str, amount: float = 1.0, date: Optional[str] = None):
-    data = fetch_daily(date)
+async def cbr_convert(from_code: str, to_code: str, amount: float = 1.0, date: Optional[str] = None):
+    data = await fetch_daily(date)
     if "error" in data:
         return data
     rates_map = data.get("rates_map") or {}
@@ -230,20 +482,19 @@ def cbr_convert(from_code: str, to_code: str, amount: float = 1.0, date: Optiona
 
 
 @app.get("/cbr/daily.csv")
-def cbr_daily_csv(date: Optional[str] = Query(None)):
-    data = fetch_daily(date)
+async def cbr_daily_csv(date: Optional[str] = Query(None)):
+    data = await fetch_daily(date)
     if "error" in data:
         return data
 
-    out = io.StringIO()
-    w = csv.writer(out, lineterminator="\n")
-    w.writerow(["char_code", "name", "nominal", "rub_per_nominal", "rub_per_1"])
-    for it in data.get("items", []):
-        per1 = (it["value"] / it["nominal"]) if it["value"] and it["nominal"] else None
-        w.writerow([it["char_code"], it["name"], it["nominal"], it["value"], f"{per1:.6f}" if per1 else ""])
-    csv_bytes = out.getvalue().encode("utf-8-sig")
-    return Response(
-        content=csv_bytes,
+    rows = _cached_entry(date, data)[2]
+
+    def _gen() -> Iterator[str]:
+        yield "\ufeff" + CSV_HEADER  # BOM so Excel picks up UTF-8
+        yield from rows
+
+    return StreamingResponse(
+        _gen(),
         media_type="text/csv; charset=utf-8",
         headers={
             "Content-Disposition": f'attachment; filename="cbr_daily_{(data.get("date") or "today").replace(".", "-")}.csv"'
@@ -252,20 +503,17 @@ def cbr_daily_csv(date: Optional[str] = Query(None)):
 
 
 @app.get("/cbr/currencies")
-def cbr_currencies(date: Optional[str] = Query(None)):
+async def cbr_currencies(date: Optional[str] = Query(None)):
     """List currency codes & names for the datalist in clients."""
-    data = fetch_daily(date)
+    data = await fetch_daily(date)
     if "error" in data:
         return data
-    rm = data.get("rates_map") or {}
-    items = [{"code": k, "name": v.get("name", k)} for k, v in rm.items()]
-    items.sort(key=lambda x: x["code"])
-    return {"date": data.get("date"), "items": items}
+    return {"date": data.get("date"), "items": _cached_entry(date, data)[3]}
 
 
 if __name__ == "__main__":
-    import os
     import uvicorn
 
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info")
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info", loop="uvloop", http="httptools", workers=workers)